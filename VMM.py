@@ -2,10 +2,625 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import libvirt
 import os
+import re
+import time
 import xml.etree.ElementTree as ET
 import subprocess
+import io
+import json
+import tarfile
+import threading
+import codecs
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+# Hilos usados para leer y definir dominios en paralelo durante exportar/importar
+BACKUP_WORKERS = 16
+
+# Líneas que conserva cada consola serie y bloques pendientes de pintar
+CONSOLE_SCROLLBACK_LINES = 5000
+CONSOLE_PENDING_CHUNKS = 1024
+CONSOLE_READ_SIZE = 4096
+CONSOLE_FLUSH_MS = 50
+# Caracteres que se pintan como máximo por ciclo; lo anterior quedaría fuera del historial
+CONSOLE_FLUSH_CHARS = 256 * 1024
+# Secuencias de escape ANSI (CSI, OSC y de dos caracteres) que Tk no sabe interpretar
+CONSOLE_ESCAPE_RE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[ -/]*[0-Z\\^-~])')
+# Caracteres de control que se descartan tras interpretar \b (se conservan \t y \n)
+CONSOLE_CONTROL_RE = re.compile(r'[\x00-\x08\x0b-\x1f\x7f]')
+# Longitud máxima de una secuencia incompleta que se guarda para el siguiente ciclo
+CONSOLE_ESCAPE_CARRY = 256
+CONSOLE_STREAM_EVENTS = (
+    libvirt.VIR_STREAM_EVENT_READABLE |
+    libvirt.VIR_STREAM_EVENT_ERROR |
+    libvirt.VIR_STREAM_EVENT_HANGUP
+)
+
+# Intervalo de consulta del progreso de los trabajos de bloque
+BLOCK_JOB_POLL_MS = 500
+# Consultas seguidas sin trabajo ni evento tras las que el resultado se da por desconocido
+BLOCK_JOB_MISSING_POLLS = 10
+
+# Versiones de libvirt (getLibVersion) que permiten revertir y eliminar snapshots externos
+LIBVIRT_EXTERNAL_REVERT_VERSION = 9009000
+LIBVIRT_EXTERNAL_DELETE_VERSION = 9000000
+
+# Secuencias que se envían a la consola para teclas sin carácter asociado
+CONSOLE_KEYS = {
+    'Return': b'\r',
+    'KP_Enter': b'\r',
+    'BackSpace': b'\x7f',
+    'Tab': b'\t',
+    'Escape': b'\x1b',
+    'Up': b'\x1b[A',
+    'Down': b'\x1b[B',
+    'Right': b'\x1b[C',
+    'Left': b'\x1b[D',
+    'Home': b'\x1b[H',
+    'End': b'\x1b[F',
+    'Delete': b'\x1b[3~'
+}
+
+
+class SerialConsole:
+    """Consola serie de una VM conectada mediante un virStream no bloqueante"""
+    
+    def __init__(self, parent, conn, vm):
+        self.vm_name = vm.name()
+        self.closed = False
+        self.lock = threading.RLock()
+        # Teclas que el stream aún no aceptó; se envían al recibir VIR_STREAM_EVENT_WRITABLE
+        self.outgoing = bytearray()
+        self.waiting_writable = False
+        # Búfer circular: si la interfaz se retrasa se descartan los bloques más antiguos
+        self.pending = deque(maxlen=CONSOLE_PENDING_CHUNKS)
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        # Secuencia de escape cortada entre dos lecturas
+        self.escape_carry = ''
+        
+        self.frame = ttk.Frame(parent)
+        self.text = tk.Text(self.frame, wrap=tk.CHAR, bg='black', fg='#d0d0d0',
+                            insertbackground='#d0d0d0', font=('Monospace', 10))
+        scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.text.bind('<Key>', self.on_key)
+        
+        self.stream = None
+        try:
+            self.stream = conn.newStream(libvirt.VIR_STREAM_NONBLOCK)
+            vm.openConsole(None, self.stream, 0)
+            self.stream.eventAddCallback(CONSOLE_STREAM_EVENTS, self.on_stream_event, None)
+        except libvirt.libvirtError:
+            if self.stream is not None:
+                try:
+                    self.stream.abort()
+                except libvirt.libvirtError:
+                    pass
+            self.frame.destroy()
+            raise
+        
+        self.frame.after(CONSOLE_FLUSH_MS, self.flush)
+    
+    def on_stream_event(self, stream, events, opaque):
+        """Atender el stream (se ejecuta en el hilo de eventos de libvirt)"""
+        disconnected = bool(events & (libvirt.VIR_STREAM_EVENT_ERROR | libvirt.VIR_STREAM_EVENT_HANGUP))
+        
+        if events & libvirt.VIR_STREAM_EVENT_WRITABLE:
+            with self.lock:
+                if not self.closed:
+                    self.write_pending()
+        
+        if events & libvirt.VIR_STREAM_EVENT_READABLE:
+            while True:
+                try:
+                    data = stream.recv(CONSOLE_READ_SIZE)
+                except libvirt.libvirtError:
+                    disconnected = True
+                    break
+                if data == -2:
+                    # No hay más datos por ahora
+                    break
+                if not data:
+                    disconnected = True
+                    break
+                self.pending.append(data)
+        
+        if disconnected:
+            self.pending.append(b'\r\n[Consola desconectada]\r\n')
+            self.close()
+    
+    def flush(self):
+        """Pintar en el widget los datos recibidos desde la última vez"""
+        if not self.frame.winfo_exists():
+            return
+        
+        chunks = []
+        while self.pending:
+            chunks.append(self.pending.popleft())
+        
+        if chunks:
+            erased, text = self.clean_output(self.decoder.decode(b''.join(chunks)))
+            # Descartar lo que no cabría en el historial antes de pasarlo a Tk
+            lines = text.rsplit('\n', CONSOLE_SCROLLBACK_LINES)
+            if len(lines) > CONSOLE_SCROLLBACK_LINES:
+                text = '\n'.join(lines[1:])
+            text = text[-CONSOLE_FLUSH_CHARS:]
+            
+            follow = self.text.yview()[1] >= 1.0
+            if erased:
+                # Los \b sobrantes borran caracteres ya pintados de la última línea
+                column = int(self.text.index('end-1c').split('.')[1])
+                erased = min(erased, column)
+                if erased:
+                    self.text.delete(f"end-{erased + 1}c", 'end-1c')
+            self.text.insert(tk.END, text)
+            
+            # Limitar el historial al número máximo de líneas
+            lines = int(self.text.index('end-1c').split('.')[0])
+            if lines > CONSOLE_SCROLLBACK_LINES:
+                self.text.delete('1.0', f"{lines - CONSOLE_SCROLLBACK_LINES + 1}.0")
+            if follow:
+                self.text.see(tk.END)
+        
+        if not self.closed or self.pending:
+            self.frame.after(CONSOLE_FLUSH_MS, self.flush)
+    
+    def clean_output(self, text):
+        """Quitar secuencias de escape y aplicar \\b; devuelve (borrados previos, texto)"""
+        text = self.escape_carry + text
+        self.escape_carry = ''
+        
+        # Una secuencia incompleta al final se completa con la siguiente lectura
+        start = text.rfind('\x1b')
+        if start != -1 and len(text) - start < CONSOLE_ESCAPE_CARRY and not CONSOLE_ESCAPE_RE.match(text, start):
+            self.escape_carry = text[start:]
+            text = text[:start]
+        
+        text = CONSOLE_ESCAPE_RE.sub('', text).replace('\r', '')
+        
+        erased = 0
+        if '\b' in text:
+            output = []
+            for char in text:
+                if char != '\b':
+                    output.append(char)
+                elif output and output[-1] != '\n':
+                    output.pop()
+                elif not output:
+                    erased += 1
+            text = ''.join(output)
+        
+        return erased, CONSOLE_CONTROL_RE.sub('', text)
+    
+    def on_key(self, event):
+        """Enviar la tecla pulsada a la consola de la VM"""
+        data = CONSOLE_KEYS.get(event.keysym)
+        if data is None and event.char:
+            data = event.char.encode('utf-8')
+        if data:
+            with self.lock:
+                if not self.closed:
+                    self.outgoing.extend(data)
+                    self.write_pending()
+        # Evitar que el widget inserte el carácter por su cuenta
+        return 'break'
+    
+    def write_pending(self):
+        """Enviar las teclas encoladas (requiere self.lock)"""
+        try:
+            while self.outgoing:
+                sent = self.stream.send(bytes(self.outgoing))
+                if sent == -2:
+                    # El stream está lleno; se reintenta cuando vuelva a ser escribible
+                    break
+                del self.outgoing[:sent]
+            
+            waiting = bool(self.outgoing)
+            if waiting != self.waiting_writable:
+                events = CONSOLE_STREAM_EVENTS
+                if waiting:
+                    events |= libvirt.VIR_STREAM_EVENT_WRITABLE
+                self.stream.eventUpdateCallback(events)
+                self.waiting_writable = waiting
+        except libvirt.libvirtError:
+            self.pending.append(b'\r\n[Consola desconectada]\r\n')
+            self.close()
+    
+    def close(self):
+        """Desconectar el stream de la consola"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                self.stream.eventRemoveCallback()
+                self.stream.abort()
+            except libvirt.libvirtError:
+                pass
+
+
+class SnapshotDialog:
+    """Diálogo para gestionar los snapshots de una VM"""
+    
+    def __init__(self, parent, vm):
+        self.parent = parent
+        self.vm = vm
+        self.conn = vm.connect()
+        self.job_disk = None
+        self.job_mode = None
+        # Estado final notificado por el bucle de eventos de libvirt
+        self.job_status = None
+        self.job_callback = None
+        self.pivoting = False
+        self.missing_polls = 0
+        self.lib_version = self.conn.getLibVersion()
+        disks = self.get_disk_targets()
+        
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Snapshots de {vm.name()}")
+        self.window.geometry("700x500")
+        
+        # Lista de snapshots
+        self.tree = ttk.Treeview(self.window, columns=('name', 'created', 'state', 'type', 'current'), show='headings')
+        self.tree.heading('name', text='Nombre')
+        self.tree.heading('created', text='Fecha de creación')
+        self.tree.heading('state', text='Estado de la VM')
+        self.tree.heading('type', text='Tipo')
+        self.tree.heading('current', text='Actual')
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        # Creación de snapshots
+        create_frame = ttk.LabelFrame(self.window, text="Nuevo snapshot", padding="10")
+        create_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.name_var = tk.StringVar(value=datetime.now().strftime("snap-%Y%m%d-%H%M%S"))
+        self.quiesce_var = tk.BooleanVar(value=True)
+        ttk.Label(create_frame, text="Nombre:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(create_frame, textvariable=self.name_var).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(create_frame, text="Congelar discos (agente invitado)", variable=self.quiesce_var).pack(side=tk.LEFT, padx=5)
+        ttk.Button(create_frame, text="Crear", command=self.create_snapshot).pack(side=tk.RIGHT, padx=5)
+        
+        action_frame = ttk.Frame(self.window)
+        action_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Button(action_frame, text="Revertir", command=self.revert_snapshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Eliminar", command=self.delete_snapshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Actualizar", command=self.refresh_snapshot_list).pack(side=tk.LEFT, padx=5)
+        if self.lib_version < LIBVIRT_EXTERNAL_REVERT_VERSION:
+            ttk.Label(
+                action_frame,
+                text=f"libvirt {self.format_version(self.lib_version)}: revertir snapshots externos requiere 9.9 o superior"
+            ).pack(side=tk.LEFT, padx=5)
+        
+        # Consolidación de la cadena de discos
+        chain_frame = ttk.LabelFrame(self.window, text="Consolidar cadena de discos", padding="10")
+        chain_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.disk_var = tk.StringVar(value=disks[0] if disks else "")
+        self.mode_var = tk.StringVar(value="commit")
+        self.bandwidth_var = tk.IntVar(value=0)
+        
+        ttk.Label(chain_frame, text="Disco:").grid(row=0, column=0, padx=5, pady=2, sticky=tk.W)
+        ttk.Combobox(chain_frame, textvariable=self.disk_var, values=disks, width=8, state='readonly').grid(row=0, column=1, padx=5, pady=2)
+        ttk.Radiobutton(chain_frame, text="Commit (hacia la base)", variable=self.mode_var, value="commit").grid(row=0, column=2, padx=5, pady=2)
+        ttk.Radiobutton(chain_frame, text="Pull (hacia la capa activa)", variable=self.mode_var, value="pull").grid(row=0, column=3, padx=5, pady=2)
+        ttk.Label(chain_frame, text="Ancho de banda (MiB/s, 0 = sin límite):").grid(row=1, column=0, columnspan=2, padx=5, pady=2, sticky=tk.W)
+        ttk.Spinbox(chain_frame, textvariable=self.bandwidth_var, from_=0, to=10000, increment=10, width=8).grid(row=1, column=2, padx=5, pady=2, sticky=tk.W)
+        self.consolidate_button = ttk.Button(chain_frame, text="Consolidar", command=self.start_block_job)
+        self.consolidate_button.grid(row=1, column=3, padx=5, pady=2, sticky=tk.E)
+        
+        self.progress = ttk.Progressbar(chain_frame, maximum=100)
+        self.progress.grid(row=2, column=0, columnspan=4, padx=5, pady=5, sticky=tk.EW)
+        self.status_var = tk.StringVar()
+        ttk.Label(chain_frame, textvariable=self.status_var).grid(row=3, column=0, columnspan=4, padx=5, sticky=tk.W)
+        chain_frame.columnconfigure(3, weight=1)
+        
+        self.refresh_snapshot_list()
+    
+    def format_version(self, version):
+        """Convertir un número de versión de libvirt a texto"""
+        return f"{version // 1000000}.{version // 1000 % 1000}.{version % 1000}"
+    
+    def is_external_snapshot(self, snapshot):
+        """Indicar si alguno de los discos del snapshot es externo"""
+        root = ET.fromstring(snapshot.getXMLDesc(0))
+        return root.find("./disks/disk[@snapshot='external']") is not None
+    
+    def get_disk_targets(self):
+        """Obtener los dispositivos de disco de la VM"""
+        root = ET.fromstring(self.vm.XMLDesc(0))
+        targets = []
+        for disk in root.findall('./devices/disk'):
+            target = disk.find('target')
+            if disk.get('device') == 'disk' and target is not None:
+                targets.append(target.get('dev'))
+        return targets
+    
+    def refresh_snapshot_list(self):
+        """Actualizar la lista de snapshots"""
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        
+        try:
+            snapshots = []
+            for snapshot in self.vm.listAllSnapshots(0):
+                root = ET.fromstring(snapshot.getXMLDesc(0))
+                creation_time = int(root.findtext('creationTime', '0'))
+                external = root.find("./disks/disk[@snapshot='external']") is not None
+                snapshots.append((
+                    creation_time,
+                    snapshot.getName(),
+                    root.findtext('state', ''),
+                    "Externo (solo discos)" if external else "Interno",
+                    "Sí" if snapshot.isCurrent() else ""
+                ))
+            
+            for creation_time, name, state, snapshot_type, current in sorted(snapshots):
+                created = datetime.fromtimestamp(creation_time).strftime("%Y-%m-%d %H:%M:%S")
+                self.tree.insert('', tk.END, values=(name, created, state, snapshot_type, current))
+        except libvirt.libvirtError as e:
+            messagebox.showerror("Error", f"No se pudo obtener la lista de snapshots: {e}", parent=self.window)
+    
+    def get_selected_snapshot(self):
+        """Obtener el snapshot seleccionado"""
+        selected_item = self.tree.focus()
+        if not selected_item:
+            messagebox.showwarning("Advertencia", "Por favor selecciona un snapshot", parent=self.window)
+            return None
+        
+        name = str(self.tree.item(selected_item)['values'][0])
+        try:
+            return self.vm.snapshotLookupByName(name, 0)
+        except libvirt.libvirtError as e:
+            messagebox.showerror("Error", f"No se pudo encontrar el snapshot: {e}", parent=self.window)
+            return None
+    
+    def build_snapshot_xml(self, name):
+        """Construir el XML de un snapshot externo que solo incluye los discos"""
+        snapshot = ET.Element('domainsnapshot')
+        ET.SubElement(snapshot, 'name').text = name
+        ET.SubElement(snapshot, 'memory', snapshot='no')
+        disks = ET.SubElement(snapshot, 'disks')
+        
+        root = ET.fromstring(self.vm.XMLDesc(0))
+        for disk in root.findall('./devices/disk'):
+            target = disk.find('target')
+            if target is None:
+                continue
+            # Los CD-ROM y discos de solo lectura no forman parte del snapshot
+            mode = 'external' if disk.get('device') == 'disk' and disk.find('readonly') is None else 'no'
+            ET.SubElement(disks, 'disk', name=target.get('dev'), snapshot=mode)
+        
+        return ET.tostring(snapshot, encoding='unicode')
+    
+    def create_snapshot(self):
+        """Crear un snapshot externo de los discos de la VM"""
+        name = self.name_var.get().strip()
+        if not name:
+            messagebox.showerror("Error", "El nombre del snapshot es requerido", parent=self.window)
+            return
+        
+        try:
+            snapshot_xml = self.build_snapshot_xml(name)
+            flags = libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_DISK_ONLY | libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_ATOMIC
+            if self.quiesce_var.get() and self.vm.isActive():
+                try:
+                    self.vm.snapshotCreateXML(snapshot_xml, flags | libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_QUIESCE)
+                except libvirt.libvirtError as e:
+                    retry = messagebox.askyesno(
+                        "Confirmar",
+                        f"No se pudieron congelar los discos mediante el agente invitado:\n{e}\n\n"
+                        "¿Crear el snapshot sin congelar los discos?",
+                        parent=self.window
+                    )
+                    if not retry:
+                        return
+                    self.vm.snapshotCreateXML(snapshot_xml, flags)
+            else:
+                self.vm.snapshotCreateXML(snapshot_xml, flags)
+        except libvirt.libvirtError as e:
+            messagebox.showerror("Error", f"No se pudo crear el snapshot: {e}", parent=self.window)
+            return
+        
+        self.name_var.set(datetime.now().strftime("snap-%Y%m%d-%H%M%S"))
+        self.refresh_snapshot_list()
+    
+    def revert_snapshot(self):
+        """Revertir la VM al snapshot seleccionado"""
+        snapshot = self.get_selected_snapshot()
+        if snapshot is None:
+            return
+        
+        try:
+            external = self.is_external_snapshot(snapshot)
+        except libvirt.libvirtError as e:
+            messagebox.showerror("Error", f"No se pudo leer el snapshot: {e}", parent=self.window)
+            return
+        if external and self.lib_version < LIBVIRT_EXTERNAL_REVERT_VERSION:
+            messagebox.showinfo(
+                "Información",
+                f"La versión instalada de libvirt ({self.format_version(self.lib_version)}) no puede "
+                "revertir snapshots externos.\nSe necesita libvirt 9.9 o superior.",
+                parent=self.window
+            )
+            return
+        
+        confirm = messagebox.askyesno(
+            "Confirmar",
+            f"¿Revertir la VM al snapshot '{snapshot.getName()}'?\nSe perderán los cambios posteriores.",
+            parent=self.window
+        )
+        if not confirm:
+            return
+        
+        try:
+            self.vm.revertToSnapshot(snapshot, 0)
+        except libvirt.libvirtError as e:
+            messagebox.showerror("Error", f"No se pudo revertir el snapshot: {e}", parent=self.window)
+            return
+        
+        self.refresh_snapshot_list()
+    
+    def delete_snapshot(self):
+        """Eliminar el snapshot seleccionado"""
+        snapshot = self.get_selected_snapshot()
+        if snapshot is None:
+            return
+        
+        confirm = messagebox.askyesno(
+            "Confirmar",
+            f"¿Estás seguro de eliminar el snapshot '{snapshot.getName()}'?",
+            parent=self.window
+        )
+        if not confirm:
+            return
+        
+        try:
+            # Antes de libvirt 9.0 un snapshot externo solo se puede eliminar de los metadatos
+            if self.is_external_snapshot(snapshot) and self.lib_version < LIBVIRT_EXTERNAL_DELETE_VERSION:
+                raise libvirt.libvirtError(
+                    f"libvirt {self.format_version(self.lib_version)} no puede eliminar snapshots "
+                    "externos (se necesita 9.0 o superior)"
+                )
+            snapshot.delete(0)
+        except libvirt.libvirtError as e:
+            # Tras consolidar la cadena solo quedan los metadatos del snapshot externo
+            metadata_only = messagebox.askyesno(
+                "Confirmar",
+                f"No se pudo eliminar el snapshot:\n{e}\n\n"
+                "¿Eliminar solo sus metadatos? Los archivos de disco no se modificarán.",
+                parent=self.window
+            )
+            if not metadata_only:
+                return
+            try:
+                snapshot.delete(libvirt.VIR_DOMAIN_SNAPSHOT_DELETE_METADATA_ONLY)
+            except libvirt.libvirtError as e:
+                messagebox.showerror("Error", f"No se pudo eliminar el snapshot: {e}", parent=self.window)
+                return
+        
+        self.refresh_snapshot_list()
+    
+    def start_block_job(self):
+        """Iniciar la consolidación de la cadena de discos en segundo plano"""
+        disk = self.disk_var.get()
+        if not disk:
+            messagebox.showwarning("Advertencia", "Por favor selecciona un disco", parent=self.window)
+            return
+        
+        try:
+            if not self.vm.isActive():
+                messagebox.showinfo("Información", "La máquina virtual debe estar en ejecución para consolidar sus discos", parent=self.window)
+                return
+            
+            bandwidth = max(self.bandwidth_var.get(), 0)
+            
+            # El resultado del trabajo llega como evento; se registra antes de iniciarlo
+            self.job_disk = disk
+            self.job_mode = self.mode_var.get()
+            self.job_status = None
+            self.pivoting = False
+            self.missing_polls = 0
+            self.job_callback = self.conn.domainEventRegisterAny(
+                self.vm, libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2, self.on_block_job_event, None
+            )
+            
+            if self.job_mode == "commit":
+                self.vm.blockCommit(disk, None, None, bandwidth, libvirt.VIR_DOMAIN_BLOCK_COMMIT_ACTIVE)
+            else:
+                self.vm.blockPull(disk, bandwidth, 0)
+        except (libvirt.libvirtError, tk.TclError) as e:
+            self.unregister_block_job_event()
+            self.job_disk = None
+            self.job_mode = None
+            messagebox.showerror("Error", f"No se pudo iniciar la consolidación: {e}", parent=self.window)
+            return
+        
+        self.consolidate_button.config(state=tk.DISABLED)
+        self.progress['value'] = 0
+        self.status_var.set(f"Consolidando {disk}...")
+        # Se programa sobre la ventana principal para terminar el trabajo aunque se cierre el diálogo
+        self.parent.after(BLOCK_JOB_POLL_MS, self.poll_block_job)
+    
+    def on_block_job_event(self, conn, dom, disk, job_type, status, opaque):
+        """Guardar el estado del trabajo (se ejecuta en el hilo de eventos de libvirt)"""
+        if disk == self.job_disk:
+            self.job_status = status
+    
+    def unregister_block_job_event(self):
+        """Dejar de recibir eventos de trabajos de bloque"""
+        if self.job_callback is None:
+            return
+        try:
+            self.conn.domainEventDeregisterAny(self.job_callback)
+        except libvirt.libvirtError:
+            pass
+        self.job_callback = None
+    
+    def poll_block_job(self):
+        """Atender el estado del trabajo de bloque y mostrar su progreso"""
+        status = self.job_status
+        if status == libvirt.VIR_DOMAIN_BLOCK_JOB_COMPLETED:
+            self.finish_block_job("Consolidación completada", True)
+            return
+        if status == libvirt.VIR_DOMAIN_BLOCK_JOB_FAILED:
+            self.finish_block_job("La consolidación falló", False)
+            return
+        if status == libvirt.VIR_DOMAIN_BLOCK_JOB_CANCELED:
+            self.finish_block_job("La consolidación fue cancelada", False)
+            return
+        
+        # Un commit de la capa activa queda listo para el pivote al sincronizarse
+        if status == libvirt.VIR_DOMAIN_BLOCK_JOB_READY and not self.pivoting:
+            try:
+                self.vm.blockJobAbort(self.job_disk, libvirt.VIR_DOMAIN_BLOCK_JOB_ABORT_PIVOT)
+                self.pivoting = True
+            except libvirt.libvirtError as e:
+                self.finish_block_job(f"Error al pivotar el disco: {e}", False)
+                return
+        
+        # blockJobInfo solo se usa para la barra de progreso
+        try:
+            info = self.vm.blockJobInfo(self.job_disk, 0)
+        except libvirt.libvirtError:
+            info = {}
+        
+        # Si el evento no llega (conexión caída, trabajo ya terminado) no se espera indefinidamente
+        if info:
+            self.missing_polls = 0
+        else:
+            self.missing_polls += 1
+            if self.missing_polls >= BLOCK_JOB_MISSING_POLLS:
+                self.finish_block_job("La consolidación terminó con resultado desconocido", False)
+                return
+        
+        if info and self.window.winfo_exists():
+            if info['end'] > 0:
+                self.progress['value'] = 100 * info['cur'] / info['end']
+            self.status_var.set(
+                f"Consolidando {self.job_disk}: "
+                f"{info['cur'] // (1024 * 1024)} / {info['end'] // (1024 * 1024)} MiB"
+            )
+        self.parent.after(BLOCK_JOB_POLL_MS, self.poll_block_job)
+    
+    def finish_block_job(self, message, success):
+        """Restablecer el estado del diálogo al terminar un trabajo de bloque"""
+        self.unregister_block_job_event()
+        self.job_disk = None
+        self.job_mode = None
+        self.job_status = None
+        self.pivoting = False
+        if not self.window.winfo_exists():
+            return
+        
+        self.progress['value'] = 100 if success else 0
+        self.status_var.set(message)
+        self.consolidate_button.config(state=tk.NORMAL)
+        self.refresh_snapshot_list()
+
+
 class LibvirtManager:
     def __init__(self, root):
         self.root = root
@@ -14,6 +629,9 @@ class LibvirtManager:
         
         # Conexión a libvirt
         self.conn = None
+        self.console_window = None
+        self.console_tabs = None
+        self.consoles = {}
         self.connect_to_libvirt()
         
         if self.conn is None:
@@ -57,6 +675,7 @@ class LibvirtManager:
                     "Luego cierra sesión y vuelve a ingresar."
                 )
                 return
+            self.start_event_loop()
             self.conn = libvirt.open("qemu:///session")
             if self.conn is None:
                 messagebox.showerror("Error", "No se pudo conectar a libvirt")
@@ -65,6 +684,20 @@ class LibvirtManager:
             messagebox.showerror("Error", f"Error de libvirt: {e}")
             self.root.destroy()
     
+    def start_event_loop(self):
+        """Iniciar el bucle de eventos de libvirt en un hilo aparte"""
+        # Debe registrarse antes de abrir la conexión
+        libvirt.virEventRegisterDefaultImpl()
+        
+        def run():
+            while True:
+                if libvirt.virEventRunDefaultImpl() < 0:
+                    # Evitar un bucle activo si el bucle de eventos falla de forma repetida
+                    print("Error en el bucle de eventos de libvirt")
+                    time.sleep(1)
+        
+        threading.Thread(target=run, name="libvirt-events", daemon=True).start()
+    
     def create_widgets(self):
         # Frame principal
         main_frame = ttk.Frame(self.root, padding="10")
@@ -81,6 +714,10 @@ class LibvirtManager:
         ttk.Button(action_frame, text="Eliminar VM", command=self.delete_vm).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="Actualizar", command=self.refresh_vm_list).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="Consola", command=self.open_console).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Visor gráfico", command=self.open_graphical_console).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Snapshots", command=self.show_snapshot_dialog).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Exportar", command=self.export_vms).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Importar", command=self.import_vms).pack(side=tk.LEFT, padx=5)
         
         # Treeview para mostrar las VMs
         self.tree = ttk.Treeview(main_frame, columns=('name', 'status', 'memory', 'vcpus', 'os'), show='headings')
@@ -418,8 +1055,513 @@ class LibvirtManager:
         except libvirt.libvirtError as e:
             messagebox.showerror("Error", f"No se pudo eliminar la VM: {e}")
     
+    def show_snapshot_dialog(self):
+        """Mostrar el gestor de snapshots de la VM seleccionada"""
+        vm = self.get_selected_vm()
+        if vm is None:
+            return
+        
+        try:
+            SnapshotDialog(self.root, vm)
+        except libvirt.libvirtError as e:
+            messagebox.showerror("Error", f"No se pudieron obtener los snapshots: {e}")
+    
+    def get_mac_addresses(self, root):
+        """Obtener las direcciones MAC de las interfaces de un XML de dominio"""
+        macs = []
+        for mac in root.findall('./devices/interface/mac'):
+            if mac.get('address'):
+                macs.append(mac.get('address').lower())
+        return macs
+    
+    def collect_domain_backup(self, vm):
+        """Leer XML, snapshots y NVRAM de una VM para el respaldo"""
+        xml_desc = vm.XMLDesc(libvirt.VIR_DOMAIN_XML_SECURE | libvirt.VIR_DOMAIN_XML_INACTIVE)
+        root = ET.fromstring(xml_desc)
+        
+        snapshots = []
+        for snapshot in vm.listAllSnapshots(0):
+            snapshots.append({
+                'name': snapshot.getName(),
+                'xml': snapshot.getXMLDesc(libvirt.VIR_DOMAIN_SNAPSHOT_XML_SECURE),
+                'current': bool(snapshot.isCurrent())
+            })
+        
+        # Contenido de la NVRAM (solo VMs UEFI)
+        nvram = None
+        nvram_path = root.findtext('./os/nvram')
+        if nvram_path and os.path.exists(nvram_path):
+            with open(nvram_path, 'rb') as f:
+                nvram = {'path': nvram_path, 'data': f.read()}
+        
+        return {
+            'name': vm.name(),
+            'uuid': vm.UUIDString(),
+            'macs': self.get_mac_addresses(root),
+            'xml': xml_desc,
+            'snapshots': self.sort_snapshots(snapshots),
+            'nvram': nvram
+        }
+    
+    def sort_snapshots(self, snapshots):
+        """Ordenar los snapshots para que cada padre preceda a sus hijos"""
+        by_name = {snapshot['name']: snapshot for snapshot in snapshots}
+        parents = {
+            snapshot['name']: ET.fromstring(snapshot['xml']).findtext('./parent/name')
+            for snapshot in snapshots
+        }
+        
+        ordered = []
+        visited = set()
+        for snapshot in snapshots:
+            # Subir por la cadena de padres hasta un snapshot ya ordenado o la raíz
+            chain = []
+            name = snapshot['name']
+            while name in by_name and name not in visited:
+                visited.add(name)
+                chain.append(by_name[name])
+                name = parents[name]
+            ordered.extend(reversed(chain))
+        return ordered
+    
+    def add_archive_file(self, archive, arcname, data):
+        """Añadir un archivo en memoria al archivo tar"""
+        info = tarfile.TarInfo(arcname)
+        info.size = len(data)
+        info.mtime = int(datetime.now().timestamp())
+        archive.addfile(info, io.BytesIO(data))
+    
+    def write_domain_backup(self, archive, backup):
+        """Escribir el respaldo de una VM en el archivo y devolver su entrada del manifiesto"""
+        base = backup['uuid']
+        entry = {
+            'name': backup['name'],
+            'uuid': backup['uuid'],
+            'macs': backup['macs'],
+            'xml': f"{base}/domain.xml",
+            'snapshots': [],
+            'nvram': None
+        }
+        self.add_archive_file(archive, entry['xml'], backup['xml'].encode())
+        
+        for index, snapshot in enumerate(backup['snapshots']):
+            arcname = f"{base}/snapshots/{index:04d}.xml"
+            self.add_archive_file(archive, arcname, snapshot['xml'].encode())
+            entry['snapshots'].append({
+                'name': snapshot['name'],
+                'file': arcname,
+                'current': snapshot['current']
+            })
+        
+        if backup['nvram'] is not None:
+            arcname = f"{base}/nvram.fd"
+            self.add_archive_file(archive, arcname, backup['nvram']['data'])
+            entry['nvram'] = {'path': backup['nvram']['path'], 'file': arcname}
+        
+        return entry
+    
+    def run_in_background(self, title, work, on_done):
+        """Ejecutar work(report) en un hilo aparte mostrando una ventana de progreso"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        # La ventana no se puede cerrar mientras el trabajo está en curso
+        dialog.protocol("WM_DELETE_WINDOW", lambda: None)
+        
+        status_var = tk.StringVar(value="Preparando...")
+        ttk.Label(dialog, textvariable=status_var, width=50).pack(padx=10, pady=5)
+        progress = ttk.Progressbar(dialog, mode='indeterminate', length=300)
+        progress.pack(padx=10, pady=10)
+        progress.start(10)
+        dialog.grab_set()
+        
+        # El hilo solo escribe en este diccionario; Tk se actualiza desde check()
+        state = {'status': status_var.get()}
+        
+        def report(message):
+            state['status'] = message
+        
+        def target():
+            try:
+                state['result'] = work(report)
+            except Exception as e:
+                state['result'] = ('error', f"{title}: {e}")
+        
+        thread = threading.Thread(target=target, name=title, daemon=True)
+        thread.start()
+        
+        def check():
+            status_var.set(state['status'])
+            if thread.is_alive():
+                dialog.after(100, check)
+                return
+            progress.stop()
+            dialog.grab_release()
+            dialog.destroy()
+            on_done(state['result'])
+        
+        dialog.after(100, check)
+    
+    def show_background_result(self, result):
+        """Mostrar el resultado (nivel, mensaje) de un trabajo en segundo plano"""
+        level, message = result
+        if level == 'error':
+            messagebox.showerror("Error", message)
+        elif level == 'warning':
+            messagebox.showwarning("Advertencia", message)
+        else:
+            messagebox.showinfo("Éxito", message)
+    
+    def export_vms(self):
+        """Exportar las definiciones de todas las VMs a un archivo comprimido"""
+        filename = filedialog.asksaveasfilename(
+            title="Exportar máquinas virtuales",
+            defaultextension=".tar.gz",
+            initialfile=f"vms-{datetime.now().strftime('%Y%m%d-%H%M%S')}.tar.gz",
+            filetypes=(("Respaldos tar.gz", "*.tar.gz"), ("Todos los archivos", "*.*"))
+        )
+        if not filename:
+            return
+        
+        self.run_in_background(
+            "Exportar máquinas virtuales",
+            lambda report: self.write_backup_archive(filename, report),
+            self.show_background_result
+        )
+    
+    def write_backup_archive(self, filename, report):
+        """Escribir el respaldo de todas las VMs (se ejecuta fuera del hilo de Tk)"""
+        try:
+            vms = self.conn.listAllDomains(0)
+        except libvirt.libvirtError as e:
+            return 'error', f"No se pudo obtener la lista de VMs: {e}"
+        
+        manifest = {
+            'version': 1,
+            'created': datetime.now().isoformat(),
+            'uri': self.conn.getURI(),
+            'domains': []
+        }
+        errors = []
+        
+        try:
+            # El respaldo incluye XML con contraseñas y la NVRAM: solo lo lee el usuario
+            fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                os.fchmod(f.fileno(), 0o600)
+                # Las VMs se leen en paralelo y se escriben al archivo según van terminando
+                with tarfile.open(fileobj=f, mode='w:gz') as archive, \
+                        ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as executor:
+                    futures = {executor.submit(self.collect_domain_backup, vm): vm for vm in vms}
+                    for done, future in enumerate(as_completed(futures), 1):
+                        report(f"Exportando {done} de {len(vms)} máquinas virtuales...")
+                        try:
+                            backup = future.result()
+                        except (libvirt.libvirtError, OSError, ET.ParseError) as e:
+                            errors.append(f"{futures[future].name()}: {e}")
+                            continue
+                        manifest['domains'].append(self.write_domain_backup(archive, backup))
+                    
+                    manifest['domains'].sort(key=lambda entry: entry['name'])
+                    self.add_archive_file(archive, 'manifest.json', json.dumps(manifest, indent=2).encode())
+        except (OSError, tarfile.TarError) as e:
+            return 'error', f"No se pudo escribir el respaldo: {e}"
+        
+        message = f"Se exportaron {len(manifest['domains'])} máquinas virtuales a:\n{filename}"
+        if errors:
+            message += "\n\nNo se pudieron exportar:\n" + "\n".join(errors)
+            return 'warning', message
+        return 'info', message
+    
+    def get_nvram_dir(self):
+        """Obtener el directorio donde libvirt guarda la NVRAM de esta conexión"""
+        if self.conn.getURI().endswith('/session'):
+            config_dir = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+            return os.path.join(config_dir, 'libvirt', 'qemu', 'nvram')
+        return '/var/lib/libvirt/qemu/nvram'
+    
+    def read_domain_backup(self, files, entry, nvram_dir):
+        """Validar la entrada de una VM con los archivos leídos del respaldo"""
+        xml_desc = files[entry['xml']].decode()
+        root = ET.fromstring(xml_desc)
+        name = root.findtext('name')
+        uuid = root.findtext('uuid')
+        if root.tag != 'domain' or not name or not uuid:
+            raise ValueError(f"definición inválida en {entry['xml']}")
+        if name != entry['name'] or uuid.lower() != entry['uuid'].lower():
+            raise ValueError(f"{entry['xml']} no coincide con el manifiesto")
+        
+        # La NVRAM solo se restaura dentro del directorio de NVRAM de libvirt
+        nvram = None
+        if entry.get('nvram'):
+            nvram_path = (root.findtext('./os/nvram') or '').strip()
+            if not nvram_path or nvram_path != entry['nvram']['path']:
+                raise ValueError(f"la ruta de NVRAM de {entry['xml']} no coincide con el manifiesto")
+            if os.path.dirname(os.path.realpath(nvram_path)) != os.path.realpath(nvram_dir):
+                raise ValueError(f"la NVRAM {nvram_path} está fuera de {nvram_dir}")
+            nvram = {'path': nvram_path, 'data': files[entry['nvram']['file']]}
+        
+        snapshots = []
+        for snapshot in entry.get('snapshots', []):
+            snapshots.append({
+                'name': snapshot['name'],
+                'xml': files[snapshot['file']].decode(),
+                'current': snapshot.get('current', False)
+            })
+        
+        return {
+            'name': name,
+            'uuid': uuid.lower(),
+            'macs': self.get_mac_addresses(root),
+            'xml': xml_desc,
+            'snapshots': self.sort_snapshots(snapshots),
+            'nvram': nvram
+        }
+    
+    def get_domain_identity(self, vm):
+        """Obtener nombre, UUID y MACs de una VM existente"""
+        root = ET.fromstring(vm.XMLDesc(libvirt.VIR_DOMAIN_XML_INACTIVE))
+        return vm.name(), vm.UUIDString().lower(), self.get_mac_addresses(root)
+    
+    def remove_mac_addresses(self, backup, addresses):
+        """Quitar MACs del XML de un respaldo para que libvirt genere otras nuevas"""
+        root = ET.fromstring(backup['xml'])
+        for interface in root.findall('./devices/interface'):
+            mac = interface.find('mac')
+            if mac is not None and (mac.get('address') or '').lower() in addresses:
+                interface.remove(mac)
+        backup['xml'] = ET.tostring(root, encoding='unicode')
+        backup['macs'] = [mac for mac in backup['macs'] if mac not in addresses]
+    
+    def find_import_conflicts(self, backups):
+        """Separar los respaldos que se pueden definir de los que tienen conflictos"""
+        with ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as executor:
+            identities = list(executor.map(self.get_domain_identity, self.conn.listAllDomains(0)))
+        
+        names = {name for name, _, _ in identities}
+        uuids = {uuid for _, uuid, _ in identities}
+        macs = {mac for _, _, vm_macs in identities for mac in vm_macs}
+        
+        accepted = []
+        conflicts = []
+        regenerated = []
+        for backup in backups:
+            reasons = []
+            if backup['name'] in names:
+                reasons.append("nombre en uso")
+            if backup['uuid'] in uuids:
+                reasons.append("UUID en uso")
+            
+            if reasons:
+                conflicts.append(f"{backup['name']}: {', '.join(reasons)}")
+                continue
+            
+            # Una MAC repetida no impide importar la VM: libvirt le asigna una nueva
+            duplicated_macs = {mac for mac in backup['macs'] if mac in macs}
+            if duplicated_macs:
+                self.remove_mac_addresses(backup, duplicated_macs)
+                regenerated.append(f"{backup['name']}: {', '.join(sorted(duplicated_macs))}")
+            
+            # Reservar la identidad para detectar duplicados dentro del propio archivo
+            names.add(backup['name'])
+            uuids.add(backup['uuid'])
+            macs.update(backup['macs'])
+            accepted.append(backup)
+        
+        return accepted, conflicts, regenerated
+    
+    def define_domain_backup(self, backup):
+        """Definir una VM a partir de su respaldo, con su NVRAM y snapshots"""
+        vm = self.conn.defineXML(backup['xml'])
+        missing = []
+        
+        # La NVRAM se escribe solo cuando libvirt ya aceptó la definición
+        nvram = backup['nvram']
+        if nvram is not None and os.path.lexists(nvram['path']):
+            missing.append(f"NVRAM ({nvram['path']} ya existe, se conservó)")
+        elif nvram is not None:
+            created = False
+            try:
+                os.makedirs(os.path.dirname(nvram['path']), exist_ok=True)
+                fd = os.open(nvram['path'], os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                created = True
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(nvram['data'])
+            except OSError:
+                if created:
+                    os.remove(nvram['path'])
+                vm.undefineFlags(libvirt.VIR_DOMAIN_UNDEFINE_KEEP_NVRAM)
+                raise
+        
+        # Un snapshot que falla no deshace la VM; se informa como faltante
+        for snapshot in backup['snapshots']:
+            flags = libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_REDEFINE
+            if snapshot['current']:
+                flags |= libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_CURRENT
+            try:
+                vm.snapshotCreateXML(snapshot['xml'], flags)
+            except libvirt.libvirtError as e:
+                missing.append(f"snapshot {snapshot['name']} ({e})")
+        return vm.name(), missing
+    
+    def import_vms(self):
+        """Importar las definiciones de VMs desde un archivo de respaldo"""
+        filename = filedialog.askopenfilename(
+            title="Importar máquinas virtuales",
+            filetypes=(("Respaldos tar.gz", "*.tar.gz"), ("Todos los archivos", "*.*"))
+        )
+        if not filename:
+            return
+        
+        def on_done(result):
+            self.refresh_vm_list()
+            self.show_background_result(result)
+        
+        self.run_in_background(
+            "Importar máquinas virtuales",
+            lambda report: self.restore_backup_archive(filename, report),
+            on_done
+        )
+    
+    def restore_backup_archive(self, filename, report):
+        """Definir las VMs de un respaldo (se ejecuta fuera del hilo de Tk)"""
+        report("Leyendo el archivo de respaldo...")
+        try:
+            # Una sola pasada secuencial: buscar miembros en un .tar.gz obliga a descomprimir de nuevo
+            files = {}
+            with tarfile.open(filename, 'r:gz') as archive:
+                for member in archive:
+                    if member.isfile():
+                        files[member.name] = archive.extractfile(member).read()
+            manifest = json.loads(files['manifest.json'])
+            if not isinstance(manifest, dict) or not isinstance(manifest.get('domains'), list):
+                raise ValueError("manifest.json no tiene el formato esperado")
+            entries = manifest['domains']
+        except (OSError, tarfile.TarError, KeyError, TypeError, AttributeError, ValueError) as e:
+            return 'error', f"El archivo de respaldo no es válido: {e}"
+        
+        try:
+            nvram_dir = self.get_nvram_dir()
+            
+            # Una entrada inválida se descarta sin impedir importar las demás
+            backups = []
+            invalid = []
+            for entry in entries:
+                try:
+                    backups.append(self.read_domain_backup(files, entry, nvram_dir))
+                except (AttributeError, KeyError, TypeError, ValueError, ET.ParseError) as e:
+                    name = entry.get('name', '?') if isinstance(entry, dict) else '?'
+                    invalid.append(f"{name}: {e}")
+            
+            report("Comprobando conflictos con las VMs existentes...")
+            accepted, conflicts, regenerated = self.find_import_conflicts(backups)
+        except libvirt.libvirtError as e:
+            return 'error', f"No se pudo obtener la lista de VMs: {e}"
+        
+        imported = []
+        incomplete = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as executor:
+            futures = {executor.submit(self.define_domain_backup, backup): backup for backup in accepted}
+            for done, future in enumerate(as_completed(futures), 1):
+                report(f"Definiendo {done} de {len(accepted)} máquinas virtuales...")
+                try:
+                    name, missing = future.result()
+                except (libvirt.libvirtError, OSError) as e:
+                    errors.append(f"{futures[future]['name']}: {e}")
+                    continue
+                imported.append(name)
+                if missing:
+                    incomplete.append(f"{name}: {', '.join(missing)}")
+        
+        message = f"Se importaron {len(imported)} de {len(entries)} máquinas virtuales."
+        if regenerated:
+            message += "\n\nMAC en uso, se generó una nueva:\n" + "\n".join(sorted(regenerated))
+        if incomplete:
+            message += "\n\nImportadas de forma incompleta:\n" + "\n".join(sorted(incomplete))
+        if invalid:
+            message += "\n\nEntradas inválidas:\n" + "\n".join(sorted(invalid))
+        if conflicts:
+            message += "\n\nOmitidas por conflicto:\n" + "\n".join(sorted(conflicts))
+        if errors:
+            message += "\n\nErrores:\n" + "\n".join(sorted(errors))
+        if regenerated or incomplete or invalid or conflicts or errors:
+            return 'warning', message
+        return 'info', message
+    
+    def get_console_window(self):
+        """Obtener (o crear) la ventana con las pestañas de consolas serie"""
+        if self.console_window is not None and self.console_window.winfo_exists():
+            return self.console_window
+        
+        self.console_window = tk.Toplevel(self.root)
+        self.console_window.title("Consolas serie")
+        self.console_window.geometry("800x500")
+        self.console_window.protocol("WM_DELETE_WINDOW", self.close_console_window)
+        
+        self.console_tabs = ttk.Notebook(self.console_window)
+        self.console_tabs.pack(fill=tk.BOTH, expand=True)
+        
+        button_frame = ttk.Frame(self.console_window)
+        button_frame.pack(fill=tk.X, pady=5)
+        ttk.Button(button_frame, text="Cerrar pestaña", command=self.close_console_tab).pack(side=tk.RIGHT, padx=5)
+        
+        return self.console_window
+    
+    def close_console_tab(self):
+        """Cerrar la consola de la pestaña seleccionada"""
+        selected = self.console_tabs.select()
+        if not selected:
+            return
+        
+        for vm_name, console in list(self.consoles.items()):
+            if str(console.frame) == selected:
+                console.close()
+                console.frame.destroy()
+                del self.consoles[vm_name]
+                break
+    
+    def close_console_window(self):
+        """Cerrar todas las consolas y su ventana"""
+        for console in self.consoles.values():
+            console.close()
+        self.consoles.clear()
+        self.console_window.destroy()
+        self.console_window = None
+    
     def open_console(self):
-        """Abrir consola de la VM seleccionada"""
+        """Abrir la consola serie de la VM seleccionada en una pestaña"""
+        vm = self.get_selected_vm()
+        if vm is None:
+            return
+        
+        try:
+            if not vm.isActive():
+                messagebox.showinfo("Información", "La máquina virtual debe estar en ejecución para abrir la consola")
+                return
+            
+            window = self.get_console_window()
+            console = self.consoles.get(vm.name())
+            if console is not None and not console.closed:
+                self.console_tabs.select(console.frame)
+                window.lift()
+                return
+            if console is not None:
+                console.frame.destroy()
+            
+            console = SerialConsole(self.console_tabs, self.conn, vm)
+            self.consoles[vm.name()] = console
+            self.console_tabs.add(console.frame, text=vm.name())
+            self.console_tabs.select(console.frame)
+            console.text.focus_set()
+            window.lift()
+        
+        except libvirt.libvirtError as e:
+            messagebox.showerror("Error", f"No se pudo abrir la consola: {e}")
+    
+    def open_graphical_console(self):
+        """Abrir la consola gráfica de la VM seleccionada"""
         vm = self.get_selected_vm()
         if vm is None:
             return
@@ -430,17 +1572,18 @@ class LibvirtManager:
                 return
             
             # Usar virt-viewer si está disponible
+            uri = self.conn.getURI()
             try:
-                subprocess.Popen(['virt-viewer', '-c', 'qemu:///system', vm.name()])
+                subprocess.Popen(['virt-viewer', '-c', uri, vm.name()])
             except FileNotFoundError:
                 # Alternativa: usar remote-viewer
                 try:
-                    subprocess.Popen(['remote-viewer', f"qemu:///system?name={vm.name()}"])
+                    subprocess.Popen(['remote-viewer', f"{uri}?name={vm.name()}"])
                 except FileNotFoundError:
                     messagebox.showwarning(
                         "Advertencia",
                         "No se encontró virt-viewer ni remote-viewer.\n"
-                        "Instala virt-viewer para acceder a la consola gráfica."
+                        "Instala virt-viewer o usa la consola serie."
                     )
         
         except Exception as e: